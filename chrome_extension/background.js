@@ -8,6 +8,10 @@ console.log('Voice browser background script loaded');
 let ws = null;
 let reconnectInterval = null;
 
+// Control messages are JSON sent as binary WebSocket frames
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
 // Inject content script into all existing tabs on extension load
 async function injectContentScriptIntoAllTabs() {
     const tabs = await chrome.tabs.query({});
@@ -36,6 +40,7 @@ injectContentScriptIntoAllTabs();
 function connectWebSocket() {
     try {
         ws = new WebSocket('ws://localhost:8080/ws');
+        ws.binaryType = 'arraybuffer';
         
         ws.onopen = () => {
             console.log('Connected to voice browser backend');
@@ -53,18 +58,49 @@ function connectWebSocket() {
         
         ws.onmessage = (event) => {
             try {
-                const message = JSON.parse(event.data);
+                const data = typeof event.data === 'string'
+                    ? event.data
+                    : textDecoder.decode(event.data);
+                const message = JSON.parse(data);
                 console.log('✅ Received from backend:', message);
                 
                 // Broadcast to ALL tabs, not just active
                 chrome.tabs.query({}, (tabs) => {
+                    // Actions are ACKed once a tab reports them applied, and
+                    // NACKed once every tab has failed or was unreachable
+                    let acked = false;
+                    let pending = tabs.length;
+                    let lastError = 'No tabs';
+                    const settle = (success, error) => {
+                        pending -= 1;
+                        if (!success) {
+                            lastError = error || lastError;
+                        }
+                        if (!message.id || acked) {
+                            return;
+                        }
+                        if (success) {
+                            acked = true;
+                            sendAck(message.id, true);
+                        } else if (pending === 0) {
+                            acked = true;
+                            sendAck(message.id, false, lastError);
+                        }
+                    };
+                    
+                    if (!tabs.length && message.id) {
+                        sendAck(message.id, false, lastError);
+                    }
+                    
                     tabs.forEach(tab => {
                         chrome.tabs.sendMessage(tab.id, message, (response) => {
                             if (chrome.runtime.lastError) {
-                                // Ignore errors for tabs without content script
+                                // Tabs without a content script count as failures
                                 console.debug('Tab', tab.id, 'not ready:', chrome.runtime.lastError.message);
+                                settle(false, chrome.runtime.lastError.message);
                             } else {
-                                console.log('✅ Message sent to tab', tab.id);
+                                console.log('✅ Message handled by tab', tab.id, response);
+                                settle(Boolean(response?.success), response?.error);
                             }
                         });
                     });
@@ -96,6 +132,14 @@ function connectWebSocket() {
     }
 }
 
+// Tell the backend whether an action was applied
+function sendAck(id, ok, error) {
+    if (ws && ws.readyState === WebSocket.OPEN) {
+        const reply = ok ? { ack: id } : { ack: id, ok: false, error: error };
+        ws.send(textEncoder.encode(JSON.stringify(reply)));
+    }
+}
+
 // Broadcast message to all tabs
 function broadcastToAllTabs(message) {
     chrome.tabs.query({}, (tabs) => {
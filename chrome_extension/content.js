@@ -217,60 +217,60 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     // Show processing status for actions
     updateStatus('processing', 'Executing...');
     
+    // Report the action's outcome once it has actually been applied
+    const done = (success, error) => {
+        if (success) {
+            // Reset to ready state after action completes
+            setTimeout(() => updateStatus('idle', 'Ready'), 1500);
+        } else {
+            console.warn('Action failed:', error);
+            updateStatus('error', 'Action failed');
+            setTimeout(() => updateStatus('idle', 'Ready'), 2000);
+        }
+        sendResponse(success ? { success: true } : { success: false, error: error });
+    };
+    
     try {
         switch (action.type) {
             case 'scroll':
-                handleScroll(action);
-                sendResponse({ success: true });
+                handleScroll(action, done);
                 break;
                 
             case 'click':
-                handleClick(action);
-                sendResponse({ success: true });
+                handleClick(action, done);
                 break;
                 
             case 'input':
-                handleInput(action);
-                sendResponse({ success: true });
+                handleInput(action, done);
                 break;
                 
             case 'navigate':
-                handleNavigate(action);
-                sendResponse({ success: true });
+                handleNavigate(action, done);
                 break;
                 
             case 'tab':
-                handleTab(action);
-                sendResponse({ success: true });
+                handleTab(action, done);
                 break;
                 
             case 'browser':
-                handleBrowser(action);
-                sendResponse({ success: true });
+                handleBrowser(action, done);
                 break;
                 
             default:
                 console.error('Unknown action type:', action.type);
-                updateStatus('error', 'Unknown action');
-                setTimeout(() => updateStatus('idle', 'Ready'), 2000);
-                sendResponse({ success: false, error: 'Unknown action' });
+                done(false, 'Unknown action');
         }
         
-        // Reset to ready state after action completes
-        setTimeout(() => updateStatus('idle', 'Ready'), 1500);
-        
     } catch (error) {
         console.error('Action error:', error);
-        updateStatus('error', 'Action failed');
-        setTimeout(() => updateStatus('idle', 'Ready'), 2000);
-        sendResponse({ success: false, error: error.message });
+        done(false, error.message);
     }
     
     return true;
 });
 
 // Action handlers
-function handleScroll(action) {
+function handleScroll(action, done) {
     const direction = action.direction || 'down';
     const amount = action.amount || window.innerHeight * 0.8;
     
@@ -283,9 +283,10 @@ function handleScroll(action) {
     } else if (direction === 'bottom') {
         window.scrollTo({ top: document.body.scrollHeight, behavior: 'smooth' });
     }
+    done(true);
 }
 
-function handleClick(action) {
+function handleClick(action, done) {
     const text = action.text;
     const selector = action.selector;
     
@@ -305,13 +306,16 @@ function handleClick(action) {
     
     if (element) {
         element.scrollIntoView({ behavior: 'smooth', block: 'center' });
-        setTimeout(() => element.click(), 300);
+        setTimeout(() => {
+            element.click();
+            done(true);
+        }, 300);
     } else {
-        console.warn('Element not found:', text || selector);
+        done(false, `Element not found: ${text || selector}`);
     }
 }
 
-function handleInput(action) {
+function handleInput(action, done) {
     const value = action.value;
     const activeElement = document.activeElement;
     
@@ -319,6 +323,7 @@ function handleInput(action) {
         activeElement.value = value;
         activeElement.dispatchEvent(new Event('input', { bubbles: true }));
         activeElement.dispatchEvent(new Event('change', { bubbles: true }));
+        done(true);
     } else {
         // Try to find a visible input field
         const inputs = document.querySelectorAll('input[type="text"], input[type="search"], textarea');
@@ -332,41 +337,57 @@ function handleInput(action) {
             visibleInput.value = value;
             visibleInput.dispatchEvent(new Event('input', { bubbles: true }));
             visibleInput.dispatchEvent(new Event('change', { bubbles: true }));
+            done(true);
+        } else {
+            done(false, 'No input field found');
         }
     }
 }
 
-function handleNavigate(action) {
+function handleNavigate(action, done) {
     const url = action.url;
     if (url) {
+        // Respond before the page unloads
+        done(true);
         window.location.href = url;
+    } else {
+        done(false, 'No URL');
     }
 }
 
-function handleTab(action) {
+function handleTab(action, done) {
     // Tab control is handled by background script
     console.log('Tab action:', action.action);
     // Forward to background script
     chrome.runtime.sendMessage({ action: action }, (response) => {
         if (chrome.runtime.lastError) {
-            console.error('Failed to send tab action to background:', chrome.runtime.lastError);
+            done(false, chrome.runtime.lastError.message);
+        } else {
+            done(Boolean(response?.success), response?.error);
         }
     });
 }
 
-function handleBrowser(action) {
+function handleBrowser(action, done) {
+    // Respond first: back, forward and refresh unload the page
     switch (action.action) {
         case 'back':
+            done(true);
             window.history.back();
             break;
         case 'forward':
+            done(true);
             window.history.forward();
             break;
         case 'refresh':
+            done(true);
             window.location.reload();
             break;
         case 'stop':
+            done(true);
             window.stop();
             break;
+        default:
+            done(false, `Unknown browser action: ${action.action}`);
     }
 }
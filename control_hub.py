@@ -1,11 +1,20 @@
 """Central control hub for voice-controlled browser."""
 
 import asyncio
+import atexit
+import contextvars
+import functools
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from typing import Optional
 import logging
+import logging.handlers
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -21,13 +30,62 @@ from services.fish_tts import FishTTS
 from parsers.command_parser import CommandParser, CommandType
 from controllers.browser_controller import BrowserController
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging - records are queued and written by a background thread
+# so terminal I/O never blocks the event loop
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 )
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+# QueueHandler formats records before queuing them; keep that to the bare
+# message so only the listener's handler adds the prefix
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[_log_queue_handler])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Seconds to wait before sending a status, so rapid transitions collapse
+STATUS_COALESCE_WINDOW = 0.02
+
+# Frames a client may fall behind by before it is dropped as too slow
+SEND_QUEUE_SIZE = 64
+# Seconds to wait for a dropped client's close handshake
+SEND_CLOSE_TIMEOUT = 1.0
+
+
+def _encode(message: dict) -> bytes:
+    """
+    Serialize a WebSocket message to JSON bytes.
+    
+    Control messages travel as binary frames so neither end runs UTF-8
+    validation on them.
+    """
+    return orjson.dumps(message)
+
+
+def _status_message(status: str, text: str) -> dict:
+    """Build a status message for the extension."""
+    return {"type": "status", "action": {"status": status, "text": text}}
+
+
+# Recurring statuses are encoded once at import
+_STATUS_PAYLOADS = {
+    key: _encode(_status_message(*key))
+    for key in [
+        ("idle", "Ready"),
+        ("listening", "Listening..."),
+        ("listening", "Fish Audio Active"),
+        ("processing", "Processing..."),
+        ("processing", "Transcribing..."),
+        ("processing", "Executing action..."),
+        ("processing", "AI agent working..."),
+    ]
+}
+_INITIAL_STATUS_JSON = _STATUS_PAYLOADS[("idle", "Ready")]
+
 app = FastAPI(title="Voice Browser Control Hub")
 
 # CORS
@@ -62,40 +120,83 @@ class VoiceBrowserHub:
         self.fish_stt = FishSTT(api_key=fish_api_key)
         self.fish_tts = FishTTS(api_key=fish_api_key) if fish_api_key else None
         self.parser = CommandParser()
+        # Repeated utterances ("scroll down") skip parsing; entries are stored
+        # as item tuples so callers can't mutate the cached command
+        self._parse_cached = functools.lru_cache(maxsize=256)(
+            lambda text: tuple(self.parser.parse(text).items())
+        )
         self.browser_controller = BrowserController(hub=self)
         
+        # Fish Audio wake/done phrases, matched in a single pass
+        self._wake_re = re.compile(r"hey fish|done fish", re.IGNORECASE)
+        
         # State
         self.is_local_listening = False
         self.is_fish_active = False
         
-        # Task management - ensure only one task runs at a time
-        self.is_task_running = False
+        # Task management - one AI agent task at a time, simple actions in parallel
+        self._agent_sem = asyncio.Semaphore(1)
+        self._simple_sem = asyncio.Semaphore(4)
+        self._agent_running = False  # For UI status reporting only
         
         # WebSocket connections for status updates
-        self.ws_connections: set = set()
+        self.ws_connections: list = []
+        # Each client has its own outgoing queue, drained by its own writer
+        # task, so a slow client never holds up a broadcast
+        self._send_queues: dict = {}  # WebSocket -> asyncio.Queue of frames
+        self._send_tasks: dict = {}  # WebSocket -> writer task
+        
+        # Status coalescing - only the latest status within the window is sent
+        self._last_status: tuple = (None, None)
+        self._pending_status_task: Optional[asyncio.Task] = None
         
         # Store event loop for thread-safe async calls
         self.event_loop = None
         
+        # STT thread -> event loop handoff: events are queued from the STT
+        # thread and drained in batches by a single consumer task
+        self._stt_events: queue.SimpleQueue = queue.SimpleQueue()
+        self._stt_wake: Optional[asyncio.Event] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self._background_tasks: set = set()
+        self._loop_tid: Optional[int] = None
+        self._exec: Optional[ThreadPoolExecutor] = None
+        # The hub doesn't use contextvars; reusing one empty context spares
+        # call_soon_threadsafe a copy_context() per wakeup
+        self._wake_context = contextvars.Context()
+        
         logger.info("Voice Browser Hub initialized")
     
     async def start(self):
         """Start the hub."""
         # Store the event loop for thread-safe async calls
-        import asyncio
         self.event_loop = asyncio.get_running_loop()
-        logger.info(f"Event loop stored: {self.event_loop}")
+        logger.info(f"Event loop stored: {type(self.event_loop).__name__}")
         
-        await self.browser_controller.initialize()
+        self._loop_tid = threading.get_ident()
+        
+        # Small dedicated pool so blocking helpers don't pile onto the
+        # interpreter-sized default executor
+        self._exec = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hub")
+        self.event_loop.set_default_executor(self._exec)
+        self._stt_wake = asyncio.Event()
+        self._drain_task = asyncio.create_task(self._drain_stt())
+        
+        # Independent startup work runs concurrently
+        await asyncio.gather(
+            self.browser_controller.initialize(),
+            self.fish_tts.warmup() if self.fish_tts else asyncio.sleep(0),
+        )
         self._start_local_listening()
         logger.info("Voice Browser Hub started (using Fish Audio V2)")
     
     def _start_local_listening(self):
         """Start local STT for command listening."""
         if not self.is_local_listening:
-            # V2 doesn't need event loop - uses threading
+            # Uploads run on our loop, reusing V2's pooled connection
             self.local_stt.start_listening(
-                self._handle_local_transcription_sync
+                self._handle_local_transcription_sync,
+                event_loop=self.event_loop,
             )
             self.is_local_listening = True
             logger.info("Local STT listening started (V2)")
@@ -109,14 +210,7 @@ class VoiceBrowserHub:
     
     def _handle_stt_status(self, status: str, text: str):
         """Handle status updates from STT service (called from thread)."""
-        if self.event_loop and self.event_loop.is_running():
-            import asyncio
-            asyncio.run_coroutine_threadsafe(
-                self.broadcast_status(status, text),
-                self.event_loop
-            )
-        else:
-            logger.error("No event loop available for status update")
+        self._enqueue_stt_event(("status", status, text))
     
     def _handle_local_transcription_sync(self, text: str):
         """
@@ -125,15 +219,53 @@ class VoiceBrowserHub:
         Args:
             text: Transcribed text
         """
-        # V2 calls this from a thread, so schedule async handler
+        # V2 may call this off the loop (or mid-upload), so hand off to the drain task
+        self._enqueue_stt_event(("trans", text))
+    
+    def _enqueue_stt_event(self, event: tuple):
+        """Queue an STT event and wake the drain task (safe from any thread)."""
         if self.event_loop and self.event_loop.is_running():
-            import asyncio
-            asyncio.run_coroutine_threadsafe(
-                self._handle_local_transcription(text),
-                self.event_loop
-            )
+            self._stt_events.put(event)
+            # Only wake once per batch; the drain task clears before draining
+            if self._stt_wake.is_set():
+                return
+            if threading.get_ident() == self._loop_tid:
+                # Already on the loop thread, no cross-thread wakeup needed
+                self._stt_wake.set()
+            else:
+                self.event_loop.call_soon_threadsafe(
+                    self._stt_wake.set, context=self._wake_context
+                )
         else:
-            logger.error("No event loop available to handle transcription")
+            logger.error(f"No event loop available for STT event: {event[0]}")
+    
+    async def _drain_stt(self):
+        """Dispatch queued STT events, one wakeup per batch."""
+        while True:
+            await self._stt_wake.wait()
+            self._stt_wake.clear()
+            
+            while True:
+                try:
+                    event = self._stt_events.get_nowait()
+                except queue.Empty:
+                    break
+                
+                if event[0] == "status":
+                    try:
+                        await self.broadcast_status(event[1], event[2])
+                    except Exception as e:
+                        logger.error(f"Status broadcast error: {e}", exc_info=True)
+                else:
+                    # Commands can run for a long time, don't block the drain
+                    self._spawn(self._handle_local_transcription(event[1]))
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a coroutine as a background task, keeping a reference to it."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
     
     async def _handle_local_transcription(self, text: str):
         """
@@ -145,10 +277,11 @@ class VoiceBrowserHub:
         # Broadcast the final transcription (but don't change status yet)
         await self.broadcast_transcription(text, partial=False)
         
-        text_lower = text.lower().strip()
+        match = self._wake_re.search(text)
+        wake_word = match.group().lower() if match else None
         
         # Check for Fish Audio activation
-        if "hey fish" in text_lower and self.fish_stt:
+        if wake_word == "hey fish" and self.fish_stt:
             logger.info("Fish Audio activated")
             await self.broadcast_status("listening", "Fish Audio Active")
             self._stop_local_listening()
@@ -158,7 +291,7 @@ class VoiceBrowserHub:
             return
         
         # Check for Fish Audio deactivation
-        if "done fish" in text_lower and self.is_fish_active:
+        if wake_word == "done fish" and self.is_fish_active:
             logger.info("Fish Audio deactivated")
             await self.broadcast_status("idle", "Ready")
             self.fish_stt.deactivate()
@@ -194,102 +327,135 @@ class VoiceBrowserHub:
         Args:
             text: Command text
         """
-        # Check if a task is already running
-        if self.is_task_running:
-            logger.warning("Task already running, ignoring new command")
-            print("⚠️  Task already in progress")
-            return
-        
-        print(f"\n⚙️  PROCESSING: {text}")
+        logger.info(f"⚙️  Processing: {text}")
         await self.broadcast_status("processing", "Processing...")
         
         # Parse command
-        command = self.parser.parse(text)
+        command = self._parse(text)
         cmd_type = command.get("type")
-        print(f"📋 COMMAND TYPE: {cmd_type}")
-        print(f"📋 FULL COMMAND: {command}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"📋 Command: {command}")
         
         if cmd_type == CommandType.UNKNOWN:
-            print("⚠️  Command not recognized")
-            await self.broadcast_status("error", "Command not recognized")
-            # Reset to ready after error
-            await asyncio.sleep(2)
-            await self.broadcast_status("idle", "Ready")
+            logger.info("⚠️  Command not recognized")
+            # Keep the error visible briefly without holding up the next command
+            self._spawn(self._transient_status("error", "Command not recognized", hold=2.0))
             return
         
         # Execute command
         if cmd_type == CommandType.COMPLEX_TASK:
             # Use browser-use for complex tasks
             description = command.get("description")
-            print(f"🤖 Using AI agent for complex task: '{description}'")
+            logger.info(f"🤖 Using AI agent for complex task: '{description}'")
             
-            # Mark task as running
-            self.is_task_running = True
+            if self._agent_running:
+                logger.info("AI agent busy, complex task queued")
             
-            await self.broadcast_status("processing", "AI agent working...")
-            
-            try:
-                result = await self.browser_controller.execute_complex_task(description)
-                print(f"✅ Task result: {result}")
-                await self.broadcast_status("idle", "Ready")
-            except Exception as e:
-                print(f"❌ Task failed: {e}")
-                await self.broadcast_status("error", "Task failed")
-                await asyncio.sleep(2)
-                await self.broadcast_status("idle", "Ready")
-            finally:
-                # Always reset task state
-                self.is_task_running = False
+            async with self._agent_sem:
+                # Mark task as running
+                self._agent_running = True
+                
+                await self.broadcast_status("processing", "AI agent working...")
+                
+                succeeded = False
+                try:
+                    result = await self.browser_controller.execute_complex_task(description)
+                    logger.info(f"✅ Task result: {result}")
+                    succeeded = True
+                except Exception as e:
+                    logger.error(f"❌ Task failed: {e}")
+                    self._spawn(self._transient_status("error", "Task failed", hold=2.0))
+                finally:
+                    # Always reset task state
+                    self._agent_running = False
+                
+                # After the reset, so the ready status no longer reports the agent
+                if succeeded:
+                    await self.broadcast_status(*self._ready_status())
         else:
             # Use simple actions for direct commands
-            print(f"🎯 Executing simple action...")
-            print(f"   Type: {cmd_type}")
-            print(f"   Details: {command}")
-            
-            # Mark task as running
-            self.is_task_running = True
+            logger.info(f"🎯 Executing simple action: {cmd_type}")
             
-            await self.broadcast_status("processing", "Executing action...")
-            
-            try:
-                success = await self.browser_controller.execute_simple_action(command)
+            async with self._simple_sem:
+                await self.broadcast_status("processing", "Executing action...")
                 
-                if success:
-                    print("✅ Action completed successfully")
-                    await self.broadcast_status("idle", "Ready")
-                else:
-                    print("❌ Action failed")
-                    await self.broadcast_status("error", "Action failed")
-                    # Reset to ready after error
-                    await asyncio.sleep(2)
-                    await self.broadcast_status("idle", "Ready")
-            except Exception as e:
-                print(f"❌ Action error: {e}")
-                await self.broadcast_status("error", "Action error")
-                await asyncio.sleep(2)
-                await self.broadcast_status("idle", "Ready")
-            finally:
-                # Always reset task state
-                self.is_task_running = False
+                try:
+                    success = await self.browser_controller.execute_simple_action(command)
+                    
+                    if success:
+                        logger.info("✅ Action completed successfully")
+                        await self.broadcast_status(*self._ready_status())
+                    else:
+                        logger.warning("❌ Action failed")
+                        self._spawn(self._transient_status("error", "Action failed", hold=2.0))
+                except Exception as e:
+                    logger.error(f"❌ Action error: {e}")
+                    self._spawn(self._transient_status("error", "Action error", hold=2.0))
+    
+    def _parse(self, text: str) -> dict:
+        """Parse command text, memoized on the normalized utterance."""
+        # Same normalization CommandParser.parse applies, so equivalent
+        # utterances share a cache entry
+        key = text.lower().strip().rstrip('.!?,;')
+        return dict(self._parse_cached(key))
+    
+    async def _transient_status(
+        self,
+        status: str,
+        text: str,
+        hold: float = 2.0,
+        then: Optional[tuple] = None,
+    ):
+        """
+        Show a status for `hold` seconds, then switch to `then`.
+        
+        Args:
+            status: Status to show
+            text: Status text
+            hold: Seconds to keep the status visible
+            then: Follow-up (status, text), defaults to the ready status
+        """
+        await self.broadcast_status(status, text)
+        await asyncio.sleep(hold)
+        # Don't override a status set by a newer command in the meantime
+        if self._last_status == (status, text):
+            await self.broadcast_status(*(then or self._ready_status()))
+    
+    def _ready_status(self) -> tuple:
+        """Status to show once a command finishes (agent may still be working)."""
+        if self._agent_running:
+            return ("processing", "AI agent working...")
+        return ("idle", "Ready")
     
     async def broadcast_status(self, status: str, text: str):
-        """Broadcast status update to all connected WebSocket clients."""
-        message = {
-            "type": "status",
-            "action": {"status": status, "text": text}
-        }
+        """
+        Broadcast status update to all connected WebSocket clients.
         
-        # Send to all connected WebSocket clients
-        disconnected = set()
-        for ws in self.ws_connections:
-            try:
-                await ws.send_json(message)
-            except Exception as e:
-                logger.debug(f"Failed to send to WebSocket: {e}")
-                disconnected.add(ws)
+        Updates are coalesced: repeats of the current status are dropped and
+        statuses superseded within STATUS_COALESCE_WINDOW are never sent.
+        """
+        if (status, text) == self._last_status:
+            return
         
-        # Remove disconnected clients
-        self.ws_connections -= disconnected
+        self._last_status = (status, text)
+        if self._pending_status_task is None or self._pending_status_task.done():
+            self._pending_status_task = asyncio.create_task(self._flush_status_soon())
+    
+    async def _flush_status_soon(self):
+        """Send the latest status once the coalescing window has passed."""
+        sent = None
+        # Statuses set while a send is in flight get their own window
+        while sent != self._last_status:
+            await asyncio.sleep(STATUS_COALESCE_WINDOW)
+            sent = self._last_status
+            await self._send_status(*sent)
+    
+    async def _send_status(self, status: str, text: str):
+        """Send a status message to all connected WebSocket clients."""
+        payload = _STATUS_PAYLOADS.get((status, text))
+        if payload is None:
+            payload = _encode(_status_message(status, text))
+        self._broadcast_payload(payload)
     
     async def broadcast_transcription(self, text: str, partial: bool = False):
         """Broadcast transcription to all connected WebSocket clients."""
@@ -297,21 +463,107 @@ class VoiceBrowserHub:
             "type": "transcription",
             "action": {"text": text, "partial": partial}
         }
+        await self.broadcast(message)
+    
+    async def broadcast(self, message: dict) -> int:
+        """
+        Send a message to all connected WebSocket clients.
+        
+        The message is serialized once and queued for every client; each
+        client's writer task sends it, so the call never waits on a slow
+        client. Clients more than SEND_QUEUE_SIZE frames behind, or whose
+        send fails, are dropped.
         
-        disconnected = set()
-        for ws in self.ws_connections:
+        Returns:
+            Number of clients the message was queued for
+        """
+        return self._broadcast_payload(_encode(message))
+    
+    def _broadcast_payload(self, payload: bytes) -> int:
+        """Queue already-encoded JSON for all connected clients."""
+        queued = 0
+        for ws in tuple(self.ws_connections):
             try:
-                await ws.send_json(message)
-            except Exception as e:
-                logger.debug(f"Failed to send to WebSocket: {e}")
-                disconnected.add(ws)
+                self._send_queues[ws].put_nowait(payload)
+                queued += 1
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping WebSocket client {SEND_QUEUE_SIZE} messages behind")
+                self._evict_connection(ws)
+        return queued
+    
+    def add_connection(self, ws: WebSocket, first: bytes):
+        """
+        Register a WebSocket client and start its writer task.
+        
+        Args:
+            ws: Accepted WebSocket
+            first: Frame to send before any broadcast
+        """
+        send_queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        send_queue.put_nowait(first)
+        self._send_queues[ws] = send_queue
+        self._send_tasks[ws] = self._spawn(self._send_loop(ws, send_queue))
+        self.ws_connections.append(ws)
+    
+    async def _send_loop(self, ws: WebSocket, send_queue: asyncio.Queue):
+        """Write one client's queued frames in order until a send fails."""
+        try:
+            while True:
+                await ws.send_bytes(await send_queue.get())
+        except Exception as e:
+            logger.debug(f"Failed to send to WebSocket: {e}")
+            self._evict_connection(ws)
+    
+    def _evict_connection(self, ws: WebSocket):
+        """Drop a client the hub gave up on and close it so the extension reconnects."""
+        self.drop_connection(ws)
+        self._spawn(self._close_quietly(ws))
+    
+    async def _close_quietly(self, ws: WebSocket):
+        """Close a WebSocket with "try again later", ignoring a dead peer."""
+        try:
+            await asyncio.wait_for(ws.close(code=1013), timeout=SEND_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"WebSocket close failed: {e}")
+    
+    def handle_extension_message(self, data: bytes | str):
+        """Handle a message received from the Chrome extension."""
+        try:
+            message = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            logger.debug(f"Ignoring non-JSON message from extension: {data}")
+            return
         
-        self.ws_connections -= disconnected
+        if isinstance(message, dict) and "ack" in message:
+            self.browser_controller.acknowledge(
+                message["ack"],
+                ok=message.get("ok", True),
+                error=message.get("error"),
+            )
+    
+    def drop_connection(self, ws: WebSocket):
+        """Forget a WebSocket client and stop its writer."""
+        try:
+            self.ws_connections.remove(ws)
+        except ValueError:
+            pass
+        self._send_queues.pop(ws, None)
+        task = self._send_tasks.pop(ws, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
     
     async def cleanup(self):
         """Clean up resources."""
         self._stop_local_listening()
+        if self._drain_task:
+            self._drain_task.cancel()
         await self.browser_controller.cleanup()
+        await self.local_stt.close()
+        await self.fish_stt.close()
+        if self.fish_tts:
+            await self.fish_tts.close()
+        if self._exec:
+            self._exec.shutdown(wait=False)
         logger.info("Voice Browser Hub cleaned up")
 
 
@@ -365,42 +617,40 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for Chrome extension status updates."""
     await websocket.accept()
     logger.info("✅ WebSocket client connected")
-    print("🔌 Chrome extension connected via WebSocket")
     
-    # Add to connections
+    # Add to connections; the initial status goes out ahead of any broadcast
     if hub:
-        hub.ws_connections.add(websocket)
-        print(f"📊 Total WebSocket connections: {len(hub.ws_connections)}")
-        print(f"🔍 Connection object: {websocket}")
-        print(f"🔍 Hub ws_connections: {hub.ws_connections}")
+        hub.add_connection(websocket, _INITIAL_STATUS_JSON)
+        logger.info(f"📊 Total WebSocket connections: {len(hub.ws_connections)}")
     else:
-        print("❌ Hub not initialized!")
+        logger.error("❌ Hub not initialized!")
     
     try:
-        # Send initial status
-        initial_message = {
-            "type": "status",
-            "action": {"status": "idle", "text": "Ready"}
-        }
-        await websocket.send_json(initial_message)
-        print(f"📤 Sent initial status to extension: {initial_message}")
+        if not hub:
+            await websocket.send_bytes(_INITIAL_STATUS_JSON)
         
         while True:
             # Keep connection alive, receive any messages from extension
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            # Binary frames are the norm; accept text from older extensions
+            data = message.get("bytes") or message.get("text")
             logger.debug(f"Received from extension: {data}")
+            if hub:
+                hub.handle_extension_message(data)
     
     except WebSocketDisconnect:
         logger.info("WebSocket client disconnected")
-        print("🔌 Chrome extension disconnected")
     finally:
-        if hub and websocket in hub.ws_connections:
-            hub.ws_connections.remove(websocket)
-            print(f"📊 Total WebSocket connections: {len(hub.ws_connections)}")
+        if hub:
+            hub.drop_connection(websocket)
+            logger.info(f"📊 Total WebSocket connections: {len(hub.ws_connections)}")
 
 
 def run_server(host: str = "0.0.0.0", port: int = 8080):
-    """Run the FastAPI server."""
+    """Run the FastAPI server (uvicorn's default loop picks uvloop when installed)."""
     uvicorn.run(app, host=host, port=port, log_level="info")
 
 
@@ -2,13 +2,48 @@
 
 import asyncio
 from browser_use import Agent, Browser, Controller
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 import websockets
-import json
+import httpx
+import hashlib
 import logging
+import re
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Longest to wait for the extension to acknowledge an action, by action type
+ACK_TIMEOUTS = {
+    "scroll": 0.8,  # Smooth scroll
+    "click": 0.5,  # Click and potential page load
+    "navigate": 1.5,  # Navigation
+}
+DEFAULT_ACK_TIMEOUT = 0.5
+
+# Warm CDP-attached browsers kept for complex tasks
+BROWSER_POOL_SIZE = 2
+
+# Complex task result cache, keyed on (task, page URL)
+TASK_CACHE_SIZE = 128
+TASK_CACHE_TTL = 7 * 24 * 3600  # Seconds
+
+# Only questions about the page are cached; everything else runs every time
+# because its browser side effects (navigating, scrolling, ...) are the point
+QUESTION_TASK_RE = re.compile(
+    r"^\s*(?:what|who|whose|when|where|which|why|how|is|are|does|did|"
+    r"tell me|summari[sz]e)\b",
+    re.IGNORECASE,
+)
+# Questions that still change state (e.g. "how do I submit this") aren't cached either
+STATE_CHANGING_TASK_RE = re.compile(
+    r"\b(?:add|book|buy|cancel|checkout|comment|create|delete|email|fill|log ?in|"
+    r"log ?out|message|order|pay|post|purchase|remove|reply|reserve|schedule|"
+    r"send|sign|submit|subscribe|type|upload|write)\b",
+    re.IGNORECASE,
+)
+
 
 class BrowserController:
     """Controls browser through browser-use and WebSocket to Chrome extension."""
@@ -30,12 +65,27 @@ class BrowserController:
         self.browser: Optional[Browser] = None
         self.agent: Optional[Agent] = None
         
+        # Idle CDP-attached browsers reused across complex tasks; each
+        # checked-out browser holds a slot, so discarding one frees it
+        self._pool: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(BROWSER_POOL_SIZE)
+        # Every live browser, pooled or checked out, so cleanup reaches all
+        self._browsers: set = set()
+        
+        # Actions awaiting an ACK from the extension, by action id
+        self._pending_acks: Dict[str, asyncio.Future] = {}
+        
+        # Cached agent results: key -> (stored_at, result), oldest first
+        self._task_cache: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        # Pooled client for the CDP HTTP endpoint (page lookup for cache keys)
+        self._cdp_http = httpx.AsyncClient(base_url=cdp_url, timeout=1.0)
+        
         logger.info("Browser controller initialized")
     
     async def initialize(self):
         """Initialize browser-use agent."""
         try:
-            # Don't create browser here - create fresh one for each task
+            # Browser is attached lazily on the first complex task
             logger.info("Browser controller ready")
         except Exception as e:
             logger.error(f"Failed to initialize browser controller: {e}")
@@ -90,23 +140,36 @@ class BrowserController:
             action = {"type": "browser", "action": action_type}
         
         if action:
-            # Try extension first
-            if await self._send_to_extension(action):
-                # Wait for action to complete (scrolling, clicking, etc.)
-                # Add reasonable delay based on action type
-                if cmd_type == "scroll":
-                    await asyncio.sleep(0.8)  # Wait for smooth scroll
-                elif cmd_type == "click":
-                    await asyncio.sleep(0.5)  # Wait for click and potential page load
-                elif cmd_type == "navigate":
-                    await asyncio.sleep(1.5)  # Wait for navigation
-                else:
-                    await asyncio.sleep(0.5)  # Default delay
-                logger.info(f"Action {cmd_type} completed")
-                return True
+            action_id = uuid.uuid4().hex
+            ack = asyncio.get_running_loop().create_future()
+            self._pending_acks[action_id] = ack
+            
+            try:
+                # Try extension first
+                if await self._send_to_extension(action, action_id):
+                    # Wait for the extension to report the action applied, but
+                    # no longer than the fixed delay it used to get
+                    timeout = ACK_TIMEOUTS.get(action["type"], DEFAULT_ACK_TIMEOUT)
+                    try:
+                        applied = await asyncio.wait_for(ack, timeout=timeout)
+                    except asyncio.TimeoutError:
+                        logger.debug(f"No ACK for {cmd_type} within {timeout}s")
+                        applied = True
+                    if applied:
+                        logger.info(f"Action {cmd_type} completed")
+                        return True
+                    # Nothing to type into: an agent wouldn't find a field either
+                    if action["type"] == "input":
+                        return False
+            finally:
+                self._pending_acks.pop(action_id, None)
             
-            # Fallback to browser-use for simple commands
-            logger.info("Extension unavailable, using browser-use fallback")
+            # Fallback to browser-use needs the spoken command as its task;
+            # dictated text (Fish STT "type" commands) has none
+            if not command.get("raw_text"):
+                logger.info(f"No command text for {cmd_type}, skipping browser-use fallback")
+                return False
+            logger.info("Extension unavailable or action failed, using browser-use fallback")
             return await self._execute_with_browser_use(command)
         
         return False
@@ -121,19 +184,57 @@ class BrowserController:
             task = raw_text
             
             logger.info(f"Executing via browser-use: {task}")
-            result = await self.execute_complex_task(task)
+            # Simple actions are run for their effect, never served from cache
+            result = await self.execute_complex_task(task, use_cache=False)
             
             return "error" not in result.lower()
         except Exception as e:
             logger.error(f"Browser-use fallback error: {e}")
             return False
     
-    async def execute_complex_task(self, description: str) -> str:
+    async def _acquire_browser(self) -> Browser:
+        """Check a CDP-attached browser out of the pool, attaching one if none is idle."""
+        await self._slots.acquire()
+        try:
+            if not self._pool.empty():
+                return self._pool.get_nowait()
+            logger.info(f"Attaching browser via CDP: {self.cdp_url}")
+            # keep_alive so the agent doesn't tear the session down after each run
+            browser = Browser(cdp_url=self.cdp_url, keep_alive=True)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._browsers.add(browser)
+        return browser
+    
+    def _release_browser(self, browser: Browser):
+        """Return a healthy browser to the pool and free its slot."""
+        if browser in self._browsers:  # Not killed by cleanup meanwhile
+            self._pool.put_nowait(browser)
+        self._slots.release()
+    
+    async def _discard_browser(self, browser: Browser):
+        """Drop a checked-out browser after a failure; a waiter may attach a fresh one."""
+        self._slots.release()
+        await self._kill_browser(browser)
+    
+    async def _kill_browser(self, browser: Browser):
+        """Kill a browser unless it is already gone."""
+        if browser not in self._browsers:
+            return  # Already killed (e.g. by cleanup)
+        self._browsers.discard(browser)
+        try:
+            await browser.kill()
+        except Exception as e:
+            logger.debug(f"Browser cleanup: {e}")
+    
+    async def execute_complex_task(self, description: str, use_cache: bool = True) -> str:
         """
         Execute complex task using browser-use agent.
         
         Args:
             description: Natural language task description
+            use_cache: Whether a cached answer to the same question may be reused
             
         Returns:
             Result message
@@ -142,8 +243,15 @@ class BrowserController:
         try:
             logger.info(f"Executing complex task: {description}")
             
-            # Create fresh browser for each task to avoid stale connections
-            browser = Browser(cdp_url=self.cdp_url)
+            # Same task on the same page already answered - skip the agent
+            cache_key = await self._task_cache_key(description) if use_cache else None
+            cached = self._get_cached_result(cache_key)
+            if cached is not None:
+                logger.info(f"Task result served from cache: {cached}")
+                return cached
+            
+            # Reuse a pooled CDP session instead of reattaching for every task
+            browser = await self._acquire_browser()
             
             # Create agent for this task
             agent = Agent(
@@ -158,31 +266,110 @@ class BrowserController:
             
             logger.info(f"Task completed: {result}")
             
+            # Agent.run() records step failures in the history instead of
+            # raising; recoverable step errors leave the session usable, but
+            # a run that never finished may have left it broken
+            if not result.is_done():
+                await self._discard_browser(browser)
+                browser = None
+            
             # Extract meaningful result
             if hasattr(result, 'final_result'):
-                return str(result.final_result())
+                final_result = result.final_result()
+                # Only answers the agent itself judged successful are reused
+                # (not forced "done" after max_steps, not failed runs)
+                if final_result is not None and cache_key and result.is_successful():
+                    self._store_result(cache_key, str(final_result))
+                return str(final_result)
             return str(result)
         
         except Exception as e:
             logger.error(f"Complex task error: {e}")
+            # The session may be stale, reattach on the next task
+            if browser:
+                await self._discard_browser(browser)
+                browser = None
             return f"Error: {e}"
         
         finally:
-            # Clean up browser session
             if browser:
-                try:
-                    # browser-use Browser doesn't need explicit close
-                    # The context manager handles cleanup
-                    pass
-                except Exception as e:
-                    logger.debug(f"Browser cleanup: {e}")
-    
-    async def _send_to_extension(self, action: Dict[str, Any]) -> bool:
+                self._release_browser(browser)
+    
+    async def _task_cache_key(self, description: str) -> Optional[str]:
+        """
+        Cache key for a question about the current page.
+        
+        Returns None (don't cache) for anything that isn't a read-only
+        question, which must run every time, and when the current page
+        can't be identified.
+        """
+        if not QUESTION_TASK_RE.search(description) or STATE_CHANGING_TASK_RE.search(description):
+            return None
+        current_url = await self._current_url()
+        if current_url is None:
+            return None
+        normalized_task = re.sub(r"\s+", " ", description.lower().strip())
+        return hashlib.sha256(f"{normalized_task}|{current_url}".encode()).hexdigest()
+    
+    async def _current_url(self) -> Optional[str]:
+        """
+        URL of the only open page, from the CDP HTTP endpoint.
+        
+        CDP's target list doesn't say which tab is focused, so with several
+        pages open the page is ambiguous and None is returned.
+        """
+        try:
+            response = await self._cdp_http.get("/json/list")
+            pages = [t.get("url") for t in response.json() if t.get("type") == "page"]
+            if len(pages) == 1:
+                return pages[0]
+        except Exception as e:
+            logger.debug(f"Could not read current URL via CDP: {e}")
+        return None
+    
+    def _get_cached_result(self, key: Optional[str]) -> Optional[str]:
+        """Return a fresh cached result for key, dropping it if expired."""
+        if key is None or key not in self._task_cache:
+            return None
+        stored_at, result = self._task_cache[key]
+        if time.monotonic() - stored_at > TASK_CACHE_TTL:
+            del self._task_cache[key]
+            return None
+        return result
+    
+    def _store_result(self, key: str, result: str):
+        """Cache a task result, evicting the oldest entry when full."""
+        self._task_cache[key] = (time.monotonic(), result)
+        self._task_cache.move_to_end(key)
+        while len(self._task_cache) > TASK_CACHE_SIZE:
+            self._task_cache.popitem(last=False)
+    
+    def acknowledge(self, action_id: str, ok: bool = True, error: Optional[str] = None):
+        """
+        Record the Chrome extension's outcome for an action.
+        
+        Args:
+            action_id: ID the action was sent with
+            ok: Whether the action was applied (False for a NACK)
+            error: Reason the extension gave for a NACK
+        """
+        ack = self._pending_acks.pop(action_id, None)
+        if not ok:
+            logger.warning(f"Extension failed action {action_id}: {error}")
+        if ack and not ack.done():
+            ack.set_result(ok)
+    
+    async def _send_to_extension(
+        self,
+        action: Dict[str, Any],
+        action_id: Optional[str] = None,
+    ) -> bool:
         """
         Send action to Chrome extension via hub's WebSocket connections.
         
         Args:
             action: Action dictionary
+            action_id: Optional ID the extension echoes back as an ACK
             
         Returns:
             True if sent successfully
@@ -192,29 +379,21 @@ class BrowserController:
             return False
             
         if not self.hub.ws_connections:
-            logger.error(f"No WebSocket connections available (hub has {len(self.hub.ws_connections)} connections)")
-            print(f"\n❌ CHROME EXTENSION NOT CONNECTED!")
-            print(f"   Make sure Chrome extension is installed and loaded")
-            print(f"   Check chrome://extensions/ and look for 'Voice Browser Control'")
-            print(f"   The background service worker should show connection logs\n")
+            logger.error(
+                "❌ Chrome extension not connected. Make sure it is installed and "
+                "loaded (chrome://extensions/, 'Voice Browser Control'); the "
+                "background service worker should show connection logs"
+            )
             return False
         
         try:
             message = {"action": action}
-            sent_count = 0
-            
-            # Send to all connected WebSocket clients
-            disconnected = set()
-            for ws in self.hub.ws_connections:
-                try:
-                    await ws.send_json(message)
-                    sent_count += 1
-                except Exception as e:
-                    logger.debug(f"Failed to send to WebSocket: {e}")
-                    disconnected.add(ws)
+            if action_id:
+                message["id"] = action_id
             
-            # Remove disconnected clients
-            self.hub.ws_connections -= disconnected
+            # Queue for all connected WebSocket clients; the hub drops
+            # clients that fall too far behind or whose send fails
+            sent_count = await self.hub.broadcast(message)
             
             if sent_count > 0:
                 logger.info(f"Sent to extension ({sent_count} connections): {action}")
@@ -229,5 +408,10 @@ class BrowserController:
     
     async def cleanup(self):
         """Clean up resources."""
-        # No persistent browser to clean up
+        while not self._pool.empty():
+            self._pool.get_nowait()
+        # Includes browsers still checked out by a running task
+        for browser in list(self._browsers):
+            await self._kill_browser(browser)
+        await self._cdp_http.aclose()
         logger.info("Browser controller cleaned up")
@@ -33,6 +33,13 @@ class CommandParser:
             "go back", "go forward", "refresh", "reload",
         ]
         
+        # Phrases that indicate a multi-step task for the AI agent
+        self.complex_indicators = [
+            "book", "buy", "order", "compare", "find cheapest",
+            "fill out", "submit", "create account", "log in",
+            "add to cart", "checkout", "schedule", "reserve",
+        ]
+        
         self.patterns = {
             # Scrolling
             CommandType.SCROLL: [
@@ -88,6 +95,45 @@ class CommandParser:
                 (r"stop", self._parse_stop),
             ],
         }
+        
+        # Compile once; parse() runs every pattern against every utterance
+        self.patterns = {
+            cmd_type: [
+                (re.compile(pattern, re.IGNORECASE), parser_fn)
+                for pattern, parser_fn in patterns
+            ]
+            for cmd_type, patterns in self.patterns.items()
+        }
+        
+        # Fuse every pattern into one regex dispatched on the matching group.
+        # Each alternative is a lookahead tried at position 0, so patterns keep
+        # their priority order and may still match anywhere in the text.
+        alternatives = []
+        self._dispatch = {}
+        for cmd_type, patterns in self.patterns.items():
+            for pattern, parser_fn in patterns:
+                tag = f"p{len(alternatives)}"
+                alternatives.append(f"(?=.*?(?P<{tag}>{pattern.pattern}))")
+                self._dispatch[tag] = (cmd_type, pattern, parser_fn)
+        self._mega = re.compile("|".join(alternatives), re.IGNORECASE | re.DOTALL)
+        
+        # Index patterns by their literal leading word so an utterance that
+        # starts with a command verb only tries that verb's patterns
+        self._by_prefix: Dict[str, list] = {}
+        for cmd_type, patterns in self.patterns.items():
+            for pattern, parser_fn in patterns:
+                prefix = re.match(r"([a-z]+)(?:\\s|$)", pattern.pattern)
+                if prefix:
+                    self._by_prefix.setdefault(prefix.group(1), []).append(
+                        (cmd_type, pattern, parser_fn)
+                    )
+        
+        self._simple_re = re.compile(
+            "|".join(map(re.escape, self.simple_command_keywords))
+        )
+        self._complex_re = re.compile(
+            "|".join(map(re.escape, self.complex_indicators))
+        )
     
     def parse(self, text: str) -> Dict[str, Any]:
         """
@@ -109,16 +155,22 @@ class CommandParser:
         if self._is_simple_command(text):
             logger.info(f"Quick check: '{text}' identified as simple command")
         
-        # Try pattern matching
-        for cmd_type, patterns in self.patterns.items():
-            for pattern, parser_fn in patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    result = parser_fn(match)
-                    result["type"] = cmd_type
-                    result["raw_text"] = text
-                    logger.info(f"Parsed as {cmd_type}: {result}")
-                    return result
+        # Fast path: patterns for the leading word, anchored at the start
+        first_word = text.partition(" ")[0]
+        for cmd_type, pattern, parser_fn in self._by_prefix.get(first_word, ()):
+            match = pattern.match(text)
+            if match:
+                return self._build_result(cmd_type, parser_fn, match, text)
+        
+        # Try pattern matching - one scan finds the first pattern that matches
+        mega_match = self._mega.match(text)
+        if mega_match:
+            tag = mega_match.lastgroup
+            cmd_type, pattern, parser_fn = self._dispatch[tag]
+            # Rerun the winning pattern, anchored where it matched, so parser
+            # functions see its own groups
+            match = pattern.match(text, mega_match.start(tag))
+            return self._build_result(cmd_type, parser_fn, match, text)
         
         # Check if it's a complex task (multi-step)
         if self._is_complex_task(text):
@@ -134,13 +186,18 @@ class CommandParser:
             "raw_text": text,
         }
     
+    def _build_result(self, cmd_type: CommandType, parser_fn, match, text: str) -> Dict[str, Any]:
+        """Build the command dictionary for a matched pattern."""
+        result = parser_fn(match)
+        result["type"] = cmd_type
+        result["raw_text"] = text
+        logger.info(f"Parsed as {cmd_type}: {result}")
+        return result
+    
     def _is_simple_command(self, text: str) -> bool:
         """Quick check if command is a simple navigation/control action."""
-        # Check if text starts with or contains simple command keywords
-        for keyword in self.simple_command_keywords:
-            if text.startswith(keyword) or keyword in text:
-                return True
-        return False
+        # Check if text contains any simple command keyword
+        return self._simple_re.search(text) is not None
     
     def _is_complex_task(self, text: str) -> bool:
         """Determine if command requires browser-use (complex task)."""
@@ -148,12 +205,7 @@ class CommandParser:
         if self._is_simple_command(text):
             return False
         
-        complex_indicators = [
-            "book", "buy", "order", "compare", "find cheapest",
-            "fill out", "submit", "create account", "log in",
-            "add to cart", "checkout", "schedule", "reserve",
-        ]
-        return any(indicator in text for indicator in complex_indicators)
+        return self._complex_re.search(text) is not None
     
     # Parsing functions
     def _parse_scroll(self, match) -> Dict[str, Any]:
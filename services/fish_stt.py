@@ -6,11 +6,16 @@ import sounddevice as sd
 import httpx
 from typing import Optional, Callable
 import logging
-import io
-import wave
+from services.wav import wav_header
 
 logger = logging.getLogger(__name__)
 
+# Recording buffer capacity allocated on activation (grows if exceeded)
+INITIAL_BUFFER_SECONDS = 60
+
+# Recordings waiting for upload before new ones are dropped
+MAX_PENDING_JOBS = 4
+
 
 class FishSTT:
     """Fish Audio STT service activated by 'Hey Fish' wake phrase."""
@@ -34,9 +39,25 @@ class FishSTT:
         self.sample_rate = sample_rate
         self.is_active = False
         self.is_recording = False
-        self.audio_buffer = []
+        # Preallocated 16-bit PCM recording buffer and write cursor
+        self._pcm = np.empty(0, dtype=np.int16)
+        self._n = 0
         self.callback_fn: Optional[Callable] = None
         
+        # Pooled HTTP/2 client reused across transcriptions
+        self._http = httpx.AsyncClient(
+            base_url=api_base,
+            timeout=30.0,
+            http2=True,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_keepalive_connections=4),
+        )
+        self._prewarm_task: Optional[asyncio.Task] = None
+        
+        # Finished recordings (PCM bytes) consumed by a single upload worker
+        self._jobs: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_JOBS)
+        self._worker: Optional[asyncio.Task] = None
+        
         logger.info("Fish Audio STT initialized")
     
     def activate(self, callback: Callable[[str], None]):
@@ -49,15 +70,19 @@ class FishSTT:
         self.callback_fn = callback
         self.is_active = True
         self.is_recording = True
-        self.audio_buffer = []
+        self._pcm = np.empty(self.sample_rate * INITIAL_BUFFER_SECONDS, dtype=np.int16)
+        self._n = 0
         
         logger.info("Fish STT activated - recording started")
         
-        # Start audio stream
+        # Open the API connection while the user is still speaking
+        self._prewarm_task = asyncio.create_task(self._prewarm())
+        
+        # Start audio stream, capturing 16-bit PCM as sent to the API
         self.stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=1,
-            dtype=np.float32,
+            dtype=np.int16,
             callback=self._audio_callback,
         )
         self.stream.start()
@@ -73,69 +98,92 @@ class FishSTT:
         
         logger.info("Fish STT deactivated - processing recording")
         
-        # Transcribe accumulated audio
-        asyncio.create_task(self._transcribe_and_callback())
+        if not self._n:
+            logger.warning("No audio to transcribe")
+            return
+        
+        # Hand a snapshot of the recording to the upload worker and return
+        pcm = self._pcm[:self._n].tobytes()
+        self._n = 0
+        
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._worker_loop())
+        
+        try:
+            self._jobs.put_nowait(pcm)
+        except asyncio.QueueFull:
+            logger.warning("Fish STT upload queue full - dropping recording")
+    
+    async def _prewarm(self):
+        """Establish the pooled API connection (TCP + TLS) ahead of upload."""
+        try:
+            await self._http.head("/")
+        except Exception as e:
+            logger.debug(f"Fish API prewarm failed: {e}")
     
     def _audio_callback(self, indata, frames, time_info, status):
         """Record audio chunks."""
         if not self.is_recording:
             return
         
-        self.audio_buffer.append(indata[:, 0].copy())
+        end = self._n + frames
+        if end > len(self._pcm):
+            grown = np.empty(max(end, 2 * len(self._pcm)), dtype=np.int16)
+            grown[:self._n] = self._pcm[:self._n]
+            self._pcm = grown
+        
+        self._pcm[self._n:end] = indata[:, 0]
+        self._n = end
     
-    async def _transcribe_and_callback(self):
-        """Transcribe accumulated audio via Fish Audio API."""
-        if not self.audio_buffer:
-            logger.warning("No audio to transcribe")
-            return
+    async def _worker_loop(self):
+        """Upload queued recordings one at a time."""
+        while True:
+            pcm = await self._jobs.get()
+            try:
+                await self._transcribe_and_callback(pcm)
+            finally:
+                self._jobs.task_done()
+    
+    async def _transcribe_and_callback(self, pcm: bytes):
+        """
+        Transcribe a recording via Fish Audio API.
         
+        Args:
+            pcm: Mono 16-bit PCM audio
+        """
         try:
-            # Concatenate audio
-            audio_data = np.concatenate(self.audio_buffer)
-            
-            # Convert to WAV format in memory
-            wav_buffer = io.BytesIO()
-            with wave.open(wav_buffer, 'wb') as wav_file:
-                wav_file.setnchannels(1)
-                wav_file.setsampwidth(2)  # 16-bit
-                wav_file.setframerate(self.sample_rate)
-                
-                # Convert float32 to int16
-                audio_int16 = (audio_data * 32767).astype(np.int16)
-                wav_file.writeframes(audio_int16.tobytes())
-            
-            wav_buffer.seek(0)
+            # Build WAV in memory
+            wav_bytes = wav_header(len(pcm), self.sample_rate) + pcm
             
             # Call Fish Audio API
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.api_base}/v1/asr",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                    },
-                    files={
-                        "audio": ("audio.wav", wav_buffer, "audio/wav"),
-                    },
-                    data={
-                        "language": "en",
-                    },
-                )
+            response = await self._http.post(
+                "/v1/asr",
+                files={
+                    "audio": ("audio.wav", wav_bytes, "audio/wav"),
+                },
+                data={
+                    "language": "en",
+                },
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                text = result.get("text", "")
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    text = result.get("text", "")
-                    
-                    if text and self.callback_fn:
-                        logger.info(f"Fish transcribed: {text}")
-                        print(f"\n🐟 FISH TRANSCRIBED: {text}")
-                        if asyncio.iscoroutinefunction(self.callback_fn):
-                            await self.callback_fn(text)
-                        else:
-                            self.callback_fn(text)
-                else:
-                    logger.error(f"Fish API error: {response.status_code} - {response.text}")
+                if text and self.callback_fn:
+                    logger.info(f"🐟 Fish transcribed: {text}")
+                    if asyncio.iscoroutinefunction(self.callback_fn):
+                        await self.callback_fn(text)
+                    else:
+                        self.callback_fn(text)
+            else:
+                logger.error(f"Fish API error: {response.status_code} - {response.text}")
         
         except Exception as e:
             logger.error(f"Fish transcription error: {e}")
-        finally:
-            self.audio_buffer = []
+    
+    async def close(self):
+        """Stop the upload worker and close the HTTP client."""
+        if self._worker is not None:
+            self._worker.cancel()
+        await self._http.aclose()
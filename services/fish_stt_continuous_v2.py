@@ -4,14 +4,34 @@ import asyncio
 import numpy as np
 import sounddevice as sd
 import httpx
-from typing import Optional, Callable
+from typing import Optional, Callable, Dict
 import logging
-import io
-import wave
+import math
+import queue
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.wav import wav_header
 
 logger = logging.getLogger(__name__)
 
+# Utterance buffer capacity allocated up front (grows if exceeded)
+INITIAL_BUFFER_SECONDS = 30
+
+# Spare utterance buffers allocated up front, so handing a finished
+# utterance to the encoder never allocates on the audio thread
+SPARE_BUFFERS = 2
+
+# Utterances uploaded concurrently (on the event loop or the thread pool)
+MAX_CONCURRENT_UPLOADS = 4
+
+# Full scale of the int16 samples captured from the microphone
+INT16_SCALE = 32768.0
+
+
+def _mean_square(audio: np.ndarray) -> float:
+    """Mean square (RMS squared) of a 1-D signal, summed in one pass."""
+    return float(np.dot(audio, audio) / len(audio))
+
 
 class FishSTTContinuousV2:
     """Continuous Fish Audio STT service - simplified and reliable."""
@@ -45,31 +65,80 @@ class FishSTTContinuousV2:
         self.silence_duration = silence_duration
         self.min_audio_duration = min_audio_duration
         self.status_callback = status_callback
+        # Audio is captured as int16, so VAD thresholds are scaled to sample
+        # units; mean squares are compared against squared thresholds (no sqrt)
+        self._thr_peak = silence_threshold * INT16_SCALE
+        self._thr_sq = self._thr_peak ** 2
+        self._min_rms_sq = (self._thr_peak * 0.5) ** 2
         
         self.is_listening = False
         self.callback_fn: Optional[Callable] = None
         
-        # Audio buffering - simple approach
-        self.audio_buffer = []
-        self.silence_chunks = 0
+        # Audio buffering - preallocated utterance buffer and write cursor
+        self._pcm = np.empty(sample_rate * INITIAL_BUFFER_SECONDS, dtype=np.int16)
+        self._n = 0
+        # Running sum of squares of the buffered samples (for the quiet check)
+        self._sumsq = 0.0
+        # Frames of silence since the last voiced chunk
+        self.silence_frames = 0
         self.is_recording = False
+        # Float copy of the current chunk for the energy sum (int16 would overflow)
+        self._vad_scratch = np.empty(int(sample_rate * 0.1), dtype=np.float32)
         
-        # Threading for async transcription
-        self.transcription_thread = None
+        # Finished utterances are encoded and submitted by a worker thread;
+        # the callback hands over its buffer and takes a recycled one
+        self._utterances: queue.SimpleQueue = queue.SimpleQueue()
+        self._spare_buffers: queue.SimpleQueue = queue.SimpleQueue()
+        for _ in range(SPARE_BUFFERS):
+            self._spare_buffers.put(np.empty(sample_rate * INITIAL_BUFFER_SECONDS, dtype=np.int16))
+        threading.Thread(
+            target=self._utterance_loop, name="fish-stt-encoder", daemon=True
+        ).start()
+        
+        # Uploads run on this loop when given, otherwise on the thread pool
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        # Pooled client for the thread-pool path, shared by its workers
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_client_lock = threading.Lock()
+        self._upload_sem = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+        # Concurrent uploads finish out of order; results are held here by
+        # sequence number and handed to the callback in utterance order
+        self._next_seq = 0
+        self._deliver_seq = 0
+        self._results: Dict[int, Optional[str]] = {}
+        self._pool = ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_UPLOADS, thread_name_prefix="fish-stt"
+        )
+        
+        # Console output is printed by its own thread so the audio callback
+        # never blocks on terminal I/O
+        self._console: queue.SimpleQueue = queue.SimpleQueue()
+        threading.Thread(
+            target=self._console_loop, name="fish-stt-console", daemon=True
+        ).start()
         
         logger.info(f"Fish Audio continuous STT V2 initialized (threshold: {silence_threshold})")
     
-    def start_listening(self, callback: Callable[[str], None]):
+    def start_listening(
+        self,
+        callback: Callable[[str], None],
+        event_loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
         """
         Start listening for voice commands.
         
         Args:
             callback: Function to call with transcribed text
+            event_loop: Loop to run uploads on (callback is then invoked
+                on that loop); without one uploads run on a thread pool
         """
         self.callback_fn = callback
+        self.event_loop = event_loop
         self.is_listening = True
-        self.audio_buffer = []
-        self.silence_chunks = 0
+        self._n = 0
+        self._sumsq = 0.0
+        self.silence_frames = 0
         self.is_recording = False
         
         logger.info("Starting Fish Audio continuous listening")
@@ -78,12 +147,28 @@ class FishSTTContinuousV2:
         self.stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=1,
-            dtype=np.float32,
+            dtype=np.int16,
             callback=self._audio_callback,
             blocksize=int(self.sample_rate * 0.1),  # 100ms chunks
+            latency='low',
         )
         self.stream.start()
-        print(f"🎤 Listening... (threshold: {self.silence_threshold:.4f})")
+        
+        if self.event_loop is not None:
+            # Open the API connection before the first utterance needs it
+            asyncio.run_coroutine_threadsafe(self._prewarm(), self.event_loop)
+        
+        self._say(f"🎤 Listening... (threshold: {self.silence_threshold:.4f})")
+    
+    def _say(self, text: str, end: str = '\n'):
+        """Queue a console message (safe from the audio callback)."""
+        self._console.put((text, end))
+    
+    def _console_loop(self):
+        """Print queued console messages in order."""
+        while True:
+            text, end = self._console.get()
+            print(text, end=end, flush=True)
     
     def stop_listening(self):
         """Stop listening for voice commands."""
@@ -101,142 +186,263 @@ class FishSTTContinuousV2:
         if status:
             logger.warning(f"Audio status: {status}")
         
-        # Get mono audio and calculate RMS
-        audio_chunk = indata[:, 0].copy()
-        rms = np.sqrt(np.mean(audio_chunk ** 2))
+        # Get mono audio (a view; _append copies it)
+        audio_chunk = indata[:, 0]
         
-        # Simple voice activity detection
-        if rms > self.silence_threshold:
+        # Simple voice activity detection. RMS never exceeds the peak, so a
+        # chunk whose peak is under the threshold is silence without an RMS pass
+        peak = max(int(audio_chunk.max()), -int(audio_chunk.min()))
+        mean_sq = self._chunk_mean_square(audio_chunk) if peak > self._thr_peak else 0.0
+        if mean_sq > self._thr_sq:
             # Voice detected
             if not self.is_recording:
                 self.is_recording = True
-                self.audio_buffer = []
-                print("\r🎙️  Recording...", end='', flush=True)
+                self._n = 0
+                self._sumsq = 0.0
+                self._say("\r🎙️  Recording...", end='')
                 # Notify status callback that we're listening
                 if self.status_callback:
                     self.status_callback("listening", "Listening...")
             
-            self.audio_buffer.append(audio_chunk)
-            self.silence_chunks = 0
+            self._append(audio_chunk)
+            self._sumsq += mean_sq * len(audio_chunk)
+            self.silence_frames = 0
             
         else:
             # Silence detected
             if self.is_recording:
-                self.silence_chunks += 1
-                silence_duration = self.silence_chunks * 0.1  # 100ms per chunk
+                # Timed by frames delivered, so it holds whatever block
+                # size the host API actually uses
+                self.silence_frames += frames
+                silence_duration = self.silence_frames / self.sample_rate
                 
                 if silence_duration >= self.silence_duration:
                     # Enough silence - transcribe the buffer
                     self._process_buffer()
                     self.is_recording = False
-                    self.silence_chunks = 0
+                    self.silence_frames = 0
+    
+    def _chunk_mean_square(self, audio_chunk: np.ndarray) -> float:
+        """Mean square of an int16 chunk, widened through the scratch buffer."""
+        if len(audio_chunk) > len(self._vad_scratch):
+            self._vad_scratch = np.empty(len(audio_chunk), dtype=np.float32)
+        scratch = self._vad_scratch[:len(audio_chunk)]
+        scratch[:] = audio_chunk
+        return _mean_square(scratch)
+    
+    def _append(self, audio_chunk: np.ndarray):
+        """Copy a chunk into the utterance buffer, growing it if full."""
+        end = self._n + len(audio_chunk)
+        if end > len(self._pcm):
+            grown = np.empty(max(end, 2 * len(self._pcm)), dtype=np.int16)
+            grown[:self._n] = self._pcm[:self._n]
+            self._pcm = grown
+        
+        self._pcm[self._n:end] = audio_chunk
+        self._n = end
     
     def _process_buffer(self):
         """Process the audio buffer and send to Fish Audio API."""
-        if not self.audio_buffer:
+        if not self._n:
             return
         
         try:
-            # Concatenate audio chunks
-            audio_data = np.concatenate(self.audio_buffer)
-            duration = len(audio_data) / self.sample_rate
+            duration = self._n / self.sample_rate
             
             # Check minimum duration
             if duration < self.min_audio_duration:
                 logger.info(f"Audio too short ({duration:.2f}s), skipping")
-                print(f"\r⏩ Audio too short ({duration:.2f}s)", end='', flush=True)
-                self.audio_buffer = []
+                self._say(f"\r⏩ Audio too short ({duration:.2f}s)", end='')
+                self._n = 0
+                self._sumsq = 0.0
                 return
             
-            # Calculate RMS to verify it's not just noise
-            overall_rms = np.sqrt(np.mean(audio_data ** 2))
+            # Calculate RMS to verify it's not just noise, from the sum of
+            # squares accumulated as chunks were buffered
+            mean_sq = self._sumsq / self._n
+            overall_rms = math.sqrt(mean_sq) / INT16_SCALE
             
-            if overall_rms < self.silence_threshold * 0.5:
+            if mean_sq < self._min_rms_sq:
                 logger.info(f"Audio too quiet (RMS: {overall_rms:.4f}), skipping")
-                print(f"\r🔇 Too quiet (RMS: {overall_rms:.4f})", end='', flush=True)
-                self.audio_buffer = []
+                self._say(f"\r🔇 Too quiet (RMS: {overall_rms:.4f})", end='')
+                self._n = 0
+                self._sumsq = 0.0
                 return
             
-            print(f"\n🔄 Transcribing {duration:.1f}s (RMS: {overall_rms:.4f})...")
+            self._say(f"\n🔄 Transcribing {duration:.1f}s (RMS: {overall_rms:.4f})...")
             
             # Notify that we're processing
             if self.status_callback:
                 self.status_callback("processing", "Transcribing...")
             
-            # Convert to WAV
-            wav_data = self._audio_to_wav(audio_data)
-            
-            # Clear buffer before transcription
-            self.audio_buffer = []
-            
-            # Transcribe in a separate thread
-            self.transcription_thread = threading.Thread(
-                target=self._transcribe_sync,
-                args=(wav_data,),
-                daemon=True
-            )
-            self.transcription_thread.start()
+            # Hand the buffer to the encoder thread and keep recording into
+            # a spare one, so encoding never runs on the audio thread
+            spare = self._take_spare_buffer()
+            if spare is None:
+                # Every buffer is still with the encoder; dropping the
+                # utterance beats allocating on the audio thread
+                logger.warning("No spare audio buffer, dropping utterance")
+                self._say("\r⚠️  Encoder busy, utterance dropped", end='')
+            else:
+                self._utterances.put((self._pcm, self._n))
+                self._pcm = spare
+            self._n = 0
+            self._sumsq = 0.0
             
         except Exception as e:
             logger.error(f"Buffer processing error: {e}", exc_info=True)
-            self.audio_buffer = []
+            self._n = 0
+            self._sumsq = 0.0
+    
+    def _take_spare_buffer(self) -> Optional[np.ndarray]:
+        """Reuse a buffer the encoder has finished with, or None if none is free."""
+        try:
+            return self._spare_buffers.get_nowait()
+        except queue.Empty:
+            return None
+    
+    def _utterance_loop(self):
+        """Encode finished utterances and submit them for transcription."""
+        while True:
+            buf, n = self._utterances.get()
+            try:
+                wav_data = self._audio_to_wav(buf[:n])
+                
+                if self.event_loop is not None:
+                    # Upload on the event loop over the pooled connection
+                    seq = self._next_seq
+                    self._next_seq += 1
+                    asyncio.run_coroutine_threadsafe(
+                        self._transcribe_async(seq, wav_data), self.event_loop
+                    )
+                else:
+                    # Transcribe on a pooled worker thread
+                    self._pool.submit(self._transcribe_sync, wav_data)
+            
+            except Exception as e:
+                logger.error(f"Utterance encoding error: {e}", exc_info=True)
+            finally:
+                self._spare_buffers.put(buf)
     
     def _audio_to_wav(self, audio_data: np.ndarray) -> bytes:
-        """Convert float32 audio to WAV bytes."""
-        # Convert float32 to int16
-        audio_int16 = (audio_data * 32767).astype(np.int16)
-        
-        # Create WAV in memory
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, 'wb') as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int16.tobytes())
+        """Wrap 16-bit PCM audio in a WAV header."""
+        # join copies the samples straight from the array's buffer, once
+        return b''.join((wav_header(audio_data.nbytes, self.sample_rate), audio_data))
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP/2 client, creating it on first use (on the loop)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                http2=True,
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300),
+            )
+        return self._client
+    
+    async def _prewarm(self):
+        """Establish the pooled API connection (TCP + TLS) ahead of the first upload."""
+        try:
+            await self._get_client().head(self.api_base.rsplit('/', 2)[0] + '/')
+        except Exception as e:
+            logger.debug(f"Fish API prewarm failed: {e}")
+    
+    async def _transcribe_async(self, seq: int, wav_data: bytes):
+        """
+        Transcribe audio using Fish Audio API on the event loop.
         
-        return wav_buffer.getvalue()
+        Args:
+            seq: Utterance sequence number, used to deliver results in order
+            wav_data: WAV-encoded utterance
+        """
+        text = None
+        try:
+            async with self._upload_sem:
+                response = await self._get_client().post(
+                    self.api_base,
+                    files={'audio': ('audio.wav', wav_data, 'audio/wav')},
+                    data={'language': 'en'},
+                )
+            text = self._handle_response(response)
+            
+        except Exception as e:
+            logger.error(f"Transcription error: {e}", exc_info=True)
+            self._say(f"\n❌ Transcription failed: {e}")
+        finally:
+            # Failed uploads still take their slot so later ones aren't held
+            self._results[seq] = text
+            while self._deliver_seq in self._results:
+                ready = self._results.pop(self._deliver_seq)
+                self._deliver_seq += 1
+                if ready and self.callback_fn:
+                    self.callback_fn(ready)
+    
+    def _get_sync_client(self) -> httpx.Client:
+        """Return the pooled synchronous client, creating it on first use."""
+        with self._sync_client_lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(
+                    timeout=30.0,
+                    headers={'Authorization': f'Bearer {self.api_key}'},
+                    limits=httpx.Limits(
+                        max_keepalive_connections=MAX_CONCURRENT_UPLOADS, keepalive_expiry=300
+                    ),
+                )
+            return self._sync_client
     
     def _transcribe_sync(self, wav_data: bytes):
         """Synchronously transcribe audio using Fish Audio API."""
         try:
-            # Use httpx synchronous client
-            with httpx.Client(timeout=30.0) as client:
-                files = {'audio': ('audio.wav', wav_data, 'audio/wav')}
-                headers = {'Authorization': f'Bearer {self.api_key}'}
-                data = {'language': 'en'}
-                
-                response = client.post(
-                    self.api_base,
-                    files=files,
-                    headers=headers,
-                    data=data
-                )
+            files = {'audio': ('audio.wav', wav_data, 'audio/wav')}
+            data = {'language': 'en'}
+            
+            response = self._get_sync_client().post(
+                self.api_base,
+                files=files,
+                data=data
+            )
+            text = self._handle_response(response)
+            
+            if text and self.callback_fn:
+                self.callback_fn(text)
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    text = result.get('text', '').strip()
-                    
-                    if text:
-                        print(f"\n✅ TRANSCRIBED: '{text}'")
-                        logger.info(f"Transcribed: {text}")
-                        
-                        # Don't reset to idle - let command processing handle status
-                        # The control_hub will set status based on command execution result
-                        
-                        # Call callback
-                        if self.callback_fn:
-                            self.callback_fn(text)
-                    else:
-                        print("\n⚠️  Empty transcription")
-                        logger.warning("Empty transcription received")
-                        # Reset to idle only for empty transcriptions
-                        if self.status_callback:
-                            self.status_callback("idle", "Ready")
-                        
-                else:
-                    logger.error(f"Fish Audio API error: {response.status_code} - {response.text}")
-                    print(f"\n❌ API Error: {response.status_code}")
-                    
         except Exception as e:
             logger.error(f"Transcription error: {e}", exc_info=True)
-            print(f"\n❌ Transcription failed: {e}")
+            self._say(f"\n❌ Transcription failed: {e}")
+    
+    def _handle_response(self, response: httpx.Response) -> Optional[str]:
+        """Extract the transcription from a Fish Audio API response."""
+        if response.status_code == 200:
+            result = response.json()
+            text = result.get('text', '').strip()
+            
+            if text:
+                self._say(f"\n✅ TRANSCRIBED: '{text}'")
+                logger.info(f"Transcribed: {text}")
+                
+                # Don't reset to idle - let command processing handle status
+                # The control_hub will set status based on command execution result
+                return text
+            else:
+                self._say("\n⚠️  Empty transcription")
+                logger.warning("Empty transcription received")
+                # Reset to idle only for empty transcriptions
+                if self.status_callback:
+                    self.status_callback("idle", "Ready")
+                
+        else:
+            logger.error(f"Fish Audio API error: {response.status_code} - {response.text}")
+            self._say(f"\n❌ API Error: {response.status_code}")
+        
+        return None
+    
+    async def close(self):
+        """Shut down the upload thread pool and close the HTTP clients."""
+        self._pool.shutdown(wait=False)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        with self._sync_client_lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
@@ -6,11 +6,68 @@ import sounddevice as sd
 import numpy as np
 from typing import Optional
 import logging
-import io
-from pydub import AudioSegment
 
 logger = logging.getLogger(__name__)
 
+# Bytes requested per read from the streaming TTS response
+STREAM_CHUNK_BYTES = 4096
+
+# Playback ring capacity in samples (power of two, ~5s at 24kHz)
+RING_SAMPLES = 1 << 17
+
+# Frames per output stream callback
+PLAYBACK_BLOCKSIZE = 1024
+
+
+class _PCMRing:
+    """
+    Single-producer/single-consumer ring of int16 samples.
+    
+    The event loop writes and the PortAudio callback reads. Each side only
+    advances its own cursor, and int assignment is atomic under the GIL, so
+    neither side takes a lock.
+    """
+    
+    def __init__(self, size: int):
+        """
+        Initialize the ring.
+        
+        Args:
+            size: Capacity in samples (must be a power of two)
+        """
+        self.buf = np.zeros(size, dtype=np.int16)
+        self.mask = size - 1
+        self.w = 0  # Total samples written
+        self.r = 0  # Total samples read
+    
+    def available(self) -> int:
+        """Samples written but not yet read."""
+        return self.w - self.r
+    
+    def write(self, samples: np.ndarray) -> int:
+        """Copy as many samples as fit; returns the count written."""
+        n = min(len(samples), len(self.buf) - self.available())
+        i = self.w & self.mask
+        first = min(n, len(self.buf) - i)
+        self.buf[i:i + first] = samples[:first]
+        self.buf[:n - first] = samples[first:n]
+        self.w += n
+        return n
+    
+    def read_into(self, out: np.ndarray) -> int:
+        """Copy up to len(out) samples into out; returns the count read."""
+        n = min(len(out), self.available())
+        i = self.r & self.mask
+        first = min(n, len(self.buf) - i)
+        out[:first] = self.buf[i:i + first]
+        out[first:n] = self.buf[:n - first]
+        self.r += n
+        return n
+    
+    def clear(self):
+        """Drop unread samples (only while the reader is stopped)."""
+        self.r = self.w
+
 
 class FishTTS:
     """Fish Audio TTS service for voice feedback."""
@@ -29,16 +86,44 @@ class FishTTS:
             api_key: Fish Audio API key
             api_base: API base URL
             voice_id: Voice ID to use (optional)
-            sample_rate: Output sample rate
+            sample_rate: Output sample rate (requested from the API)
         """
         self.api_key = api_key
         self.api_base = api_base
         self.voice_id = voice_id
         self.sample_rate = sample_rate
         self.is_speaking = False
+        # Set whenever no utterance is in progress
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # Bumped by each speak() and stop(); a speak() only owns the
+        # playback state while this still matches the value it took
+        self._generation = 0
+        
+        # Downloaded PCM, consumed by the output stream callback
+        self._ring = _PCMRing(RING_SAMPLES)
+        self._carry = b""  # Odd trailing byte of the last chunk
+        self._fed_all = False
+        self._stream: Optional[sd.OutputStream] = None
+        
+        # Pooled HTTP/2 client reused across utterances
+        self._http = httpx.AsyncClient(
+            base_url=api_base,
+            timeout=30.0,
+            http2=True,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300),
+        )
         
         logger.info("Fish Audio TTS initialized")
     
+    async def warmup(self):
+        """Establish the pooled API connection (TCP + TLS) before the first utterance."""
+        try:
+            await self._http.head("/")
+        except Exception as e:
+            logger.debug(f"Fish TTS prewarm failed: {e}")
+    
     async def speak(self, text: str, blocking: bool = True):
         """
         Convert text to speech and play it.
@@ -47,69 +132,149 @@ class FishTTS:
             text: Text to speak
             blocking: Whether to wait for speech to complete
         """
-        if self.is_speaking and blocking:
+        if blocking and not self._idle.is_set():
             logger.info("Already speaking, waiting...")
-            while self.is_speaking:
-                await asyncio.sleep(0.1)
+            # Re-check after waking: another waiter may have started first
+            while not self._idle.is_set():
+                await self._idle.wait()
         
+        self._idle.clear()
         self.is_speaking = True
+        self._generation += 1
+        generation = self._generation
         logger.info(f"Speaking: {text}")
+        stream = None
+        completed = False
         
         try:
+            # Raw 16-bit mono PCM plays as-is, with no decode step
+            data = {
+                "text": text,
+                "format": "pcm",
+                "sample_rate": self.sample_rate,
+            }
+            
+            if self.voice_id:
+                data["reference_id"] = self.voice_id
+            
             # Call Fish Audio TTS API
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                data = {
-                    "text": text,
-                    "format": "mp3",
-                }
-                
-                if self.voice_id:
-                    data["reference_id"] = self.voice_id
-                
-                response = await client.post(
-                    f"{self.api_base}/v1/tts",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json=data,
-                )
-                
-                if response.status_code == 200:
-                    # Get audio data
-                    audio_data = response.content
-                    
-                    # Convert MP3 to numpy array for playback
-                    audio_segment = AudioSegment.from_mp3(io.BytesIO(audio_data))
-                    
-                    # Convert to numpy array
-                    samples = np.array(audio_segment.get_array_of_samples())
-                    
-                    # Convert to float32
-                    if audio_segment.sample_width == 2:
-                        samples = samples.astype(np.float32) / 32768.0
-                    
-                    # Reshape if stereo
-                    if audio_segment.channels == 2:
-                        samples = samples.reshape((-1, 2))
-                    
-                    # Play audio
-                    sd.play(samples, audio_segment.frame_rate)
-                    
-                    if blocking:
-                        sd.wait()
-                    
-                    logger.info("Speech completed")
-                else:
+            async with self._http.stream("POST", "/v1/tts", json=data) as response:
+                if response.status_code != 200:
+                    await response.aread()
                     logger.error(f"TTS API error: {response.status_code} - {response.text}")
+                    return
+                
+                # Start playback now and feed it chunks as they download
+                finished = self._open_stream()
+                stream = self._stream
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_BYTES):
+                    if not await self._feed(chunk, stream):
+                        # Cut off by stop() or a newer utterance
+                        return
+                self._fed_all = True
+            
+            if blocking:
+                await finished.wait()
+                logger.info("Speech completed")
+            completed = True
         
         except Exception as e:
             logger.error(f"TTS error: {e}")
         finally:
-            self.is_speaking = False
+            # A newer utterance (or stop()) has taken over; leave its state alone
+            if self._generation == generation:
+                # Failed or cancelled (CancelledError skips the except) while
+                # our stream is still open: stop it rather than play silence
+                if not completed and stream is not None and self._stream is stream:
+                    self._close_stream()
+                self.is_speaking = False
+                self._idle.set()
+    
+    async def _feed(self, chunk: bytes, stream: sd.OutputStream) -> bool:
+        """
+        Write a downloaded chunk into the playback ring.
+        
+        Args:
+            chunk: Raw PCM bytes (may split a sample)
+            stream: Stream the chunk belongs to
+        
+        Returns:
+            False if that stream has been replaced or stopped
+        """
+        if self._carry:
+            chunk = self._carry + chunk
+        usable = len(chunk) & ~1
+        self._carry = chunk[usable:]
+        samples = np.frombuffer(chunk, dtype=np.int16, count=usable // 2)
+        
+        while True:
+            if self._stream is not stream:
+                return False
+            samples = samples[self._ring.write(samples):]
+            if not len(samples):
+                return True
+            # Ring full: give the device a block's worth of time to drain
+            await asyncio.sleep(PLAYBACK_BLOCKSIZE / self.sample_rate)
+    
+    def _open_stream(self) -> asyncio.Event:
+        """Open the output stream; the returned event is set when it finishes."""
+        # Like sd.play, a new utterance cuts off whatever is still playing
+        self._close_stream()
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+        self._carry = b""
+        self._fed_all = False
+        
+        def on_finished():
+            loop.call_soon_threadsafe(self._stream_finished, stream, finished)
+        
+        stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="int16",
+            blocksize=PLAYBACK_BLOCKSIZE,
+            callback=self._play_callback,
+            finished_callback=on_finished,
+        )
+        self._stream = stream
+        stream.start()
+        return finished
+    
+    def _stream_finished(self, stream: sd.OutputStream, finished: asyncio.Event):
+        """Close a stream that has played out (runs on the event loop)."""
+        if not stream.closed:
+            stream.close()
+        if self._stream is stream:
+            self._stream = None
+        finished.set()
+    
+    def _close_stream(self):
+        """Abort the current stream, dropping any unplayed audio."""
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream.close()
+            self._stream = None
+        self._ring.clear()
+    
+    def _play_callback(self, outdata, frames, time_info, status):
+        """Copy buffered PCM into the device buffer (PortAudio thread)."""
+        out = outdata[:, 0]
+        n = self._ring.read_into(out)
+        
+        if n < frames:
+            # Underrun: pad with silence, and stop once the download is done
+            out[n:] = 0
+            if self._fed_all and not self._ring.available():
+                raise sd.CallbackStop
     
     def stop(self):
         """Stop current speech."""
-        sd.stop()
+        self._generation += 1
+        self._close_stream()
         self.is_speaking = False
+        self._idle.set()
         logger.info("Speech stopped")
+    
+    async def close(self):
+        """Close the HTTP client."""
+        await self._http.aclose()
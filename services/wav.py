@@ -0,0 +1,26 @@
+"""Minimal WAV encoding for 16-bit PCM audio."""
+
+import struct
+
+# RIFF/WAVE header for PCM audio: RIFF chunk, fmt subchunk, data subchunk
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+
+def wav_header(data_len: int, sample_rate: int, channels: int = 1) -> bytes:
+    """
+    Build the 44-byte WAV header for 16-bit PCM data.
+    
+    Args:
+        data_len: Size of the PCM data in bytes
+        sample_rate: Audio sample rate
+        channels: Number of interleaved channels
+        
+    Returns:
+        Header bytes to prepend to the PCM data
+    """
+    block_align = channels * 2
+    return WAV_HEADER.pack(
+        b'RIFF', 36 + data_len, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, sample_rate * block_align, block_align, 16,
+        b'data', data_len,
+    )